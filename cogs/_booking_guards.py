@@ -0,0 +1,146 @@
+# cogs/_booking_guards.py — dedupe, open-ticket cap and throttling for booking submissions
+# (helper module for cogs/booking.py; the leading underscore keeps main.py from loading it as a cog)
+#
+# Double-submits and client retries would otherwise each create a channel + file.
+# Everything here is synchronous, so a check and the reservation that follows it
+# can't be interleaved with another submission on the event loop.
+import os
+import json
+import time
+import hashlib
+import contextlib
+from typing import Dict
+
+import log
+
+logger = log.get_logger("booking")
+
+DEDUPE_WINDOW = float(os.getenv("BOOKING_DEDUPE_WINDOW", 600))        # seconds an identical form maps to the same ticket
+MAX_OPEN_TICKETS = int(os.getenv("BOOKING_MAX_OPEN_TICKETS", 1))      # pending tickets allowed per user
+THROTTLE_CAPACITY = float(os.getenv("BOOKING_THROTTLE_CAPACITY", 3))  # submissions allowed in a burst
+THROTTLE_REFILL = float(os.getenv("BOOKING_THROTTLE_REFILL", 300))    # seconds to earn back one submission
+
+OPEN_TICKETS: Dict[int, set] = {}    # requester_id -> channel ids of their pending tickets
+CREATING_TICKETS: Dict[int, int] = {}  # requester_id -> tickets reserved against the cap but not created yet
+RECENT_SUBMISSIONS: Dict[tuple, list] = {}  # (user_id, form hash) -> [channel_id or None while creating, timestamp]
+THROTTLES: Dict[int, "TokenBucket"] = {}
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_seconds: float):
+        self.capacity = capacity
+        self.rate = 1 / refill_seconds
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self) -> bool:
+        self._refill()
+        if self.tokens < 1: return False
+        self.tokens -= 1
+        return True
+
+    def retry_after(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+# --- Open-ticket index ---
+def load_open_tickets(data_dir: str = './data'):
+    """Rebuilds the open-ticket index from the ticket files on disk."""
+    OPEN_TICKETS.clear()
+    for filename in os.listdir(data_dir):
+        name, ext = os.path.splitext(filename)
+        if ext != '.json' or not name.isdigit(): continue
+        try:
+            with open(os.path.join(data_dir, filename), 'r') as f: data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if data.get('status') == 'pending':
+            OPEN_TICKETS.setdefault(data['requester_id'], set()).add(int(name))
+    logger.info("Indexed open booking tickets.", extra={"open_tickets": sum(map(len, OPEN_TICKETS.values()))})
+
+def set_ticket_open(requester_id: int, channel_id: int, is_open: bool):
+    if is_open:
+        OPEN_TICKETS.setdefault(requester_id, set()).add(channel_id)
+    elif channel_id in OPEN_TICKETS.get(requester_id, ()):
+        OPEN_TICKETS[requester_id].discard(channel_id)
+        if not OPEN_TICKETS[requester_id]: del OPEN_TICKETS[requester_id]
+
+def forget_submissions(channel_id: int):
+    """Stops duplicate submissions from being pointed at a ticket the user can no longer see."""
+    for key in [k for k, (cid, _) in RECENT_SUBMISSIONS.items() if cid == channel_id]:
+        del RECENT_SUBMISSIONS[key]
+
+def forget_ticket(channel_id: int):
+    """Drops a ticket from the in-memory index only; its data file is left alone."""
+    for requester_id in [uid for uid, ids in OPEN_TICKETS.items() if channel_id in ids]:
+        set_ticket_open(requester_id, channel_id, False)
+    forget_submissions(channel_id)
+
+def reserve_ticket(user_id: int):
+    CREATING_TICKETS[user_id] = CREATING_TICKETS.get(user_id, 0) + 1
+
+def release_ticket(user_id: int):
+    if CREATING_TICKETS.get(user_id, 0) <= 1: CREATING_TICKETS.pop(user_id, None)
+    else: CREATING_TICKETS[user_id] -= 1
+
+def open_ticket_limit_message(bot, user_id: int):
+    """The rejection text if the user is at their open-ticket cap, else None."""
+    # Channels deleted while the bot was offline are still indexed from their files. Until
+    # the bot is ready a missing channel may just not be cached yet, so don't prune then.
+    if bot.is_ready():
+        for channel_id in [cid for cid in OPEN_TICKETS.get(user_id, ()) if bot.get_channel(cid) is None]:
+            forget_ticket(channel_id)
+    open_ids = OPEN_TICKETS.get(user_id, set())
+    if len(open_ids) + CREATING_TICKETS.get(user_id, 0) < MAX_OPEN_TICKETS: return None
+    if not open_ids: return "⏳ Your booking ticket is already being created, hang tight!"
+    links = ", ".join(f"<#{channel_id}>" for channel_id in open_ids)
+    return f"⚠️ You already have an open booking ticket: {links}. Please wait for it to be handled before opening another."
+
+# --- Submissions ---
+def submission_key(user_id: int, fields: list) -> tuple:
+    normalized = "\x1f".join(" ".join(value.split()).casefold() for value in fields)
+    return user_id, hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def prune_submissions():
+    """Drops submissions past the window (never ones still being created) and throttles that have refilled."""
+    cutoff = time.monotonic() - DEDUPE_WINDOW
+    for stale in [k for k, (cid, ts) in RECENT_SUBMISSIONS.items() if cid is not None and ts < cutoff]:
+        del RECENT_SUBMISSIONS[stale]
+    for user_id in [uid for uid, bucket in THROTTLES.items() if bucket.is_full()]:
+        del THROTTLES[user_id]
+
+def find_recent_submission(key: tuple):
+    """Returns the [channel_id, timestamp] entry for a submission inside the window."""
+    prune_submissions()
+    return RECENT_SUBMISSIONS.get(key)
+
+def throttle_retry_after(user_id: int):
+    """Takes a token from the user's bucket; returns None if allowed, else seconds until the next one."""
+    bucket = THROTTLES.setdefault(user_id, TokenBucket(THROTTLE_CAPACITY, THROTTLE_REFILL))
+    if bucket.consume(): return None
+    return bucket.retry_after()
+
+@contextlib.contextmanager
+def claim_submission(key: tuple, user_id: int):
+    """Holds the dedupe key and a cap slot while a ticket is created; yields the entry to fill in.
+
+    On failure the key is released so the user can retry; the cap slot is always released,
+    since a created ticket is counted through OPEN_TICKETS instead.
+    """
+    entry = RECENT_SUBMISSIONS[key] = [None, time.monotonic()]
+    reserve_ticket(user_id)
+    try:
+        yield entry
+    except BaseException:
+        if RECENT_SUBMISSIONS.get(key) is entry: del RECENT_SUBMISSIONS[key]
+        raise
+    finally:
+        release_ticket(user_id)
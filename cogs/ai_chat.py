@@ -4,6 +4,10 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 
+import log
+
+logger = log.get_logger("ai_chat")
+
 # Try to import google.generativeai if available. If not, we will show helpful errors.
 try:
     import google.generativeai as genai  # type: ignore
@@ -43,12 +47,12 @@ class AIChatCog(commands.Cog, name="AI Chat (Gemini)"):
         self.available = False
 
         if not self.api_key:
-            print("[ai_chat] GEMINI_API not set in environment. Gemini commands will be disabled.")
+            logger.warning("GEMINI_API not set in environment. Gemini commands will be disabled.")
             self.available = False
             return
 
         if not _HAS_GENAI:
-            print("[ai_chat] google.generativeai library not installed. Install `google-generativeai` to enable Gemini.")
+            logger.warning("google.generativeai library not installed. Install `google-generativeai` to enable Gemini.")
             self.available = False
             return
 
@@ -57,10 +61,10 @@ class AIChatCog(commands.Cog, name="AI Chat (Gemini)"):
             genai.configure(api_key=self.api_key)
             # one-time test call is avoided to be non-blocking at startup; rely on runtime errors instead
             self.available = True
-            print(f"[ai_chat] Gemini configured (model={self.model}).")
+            logger.info(f"Gemini configured (model={self.model}).", extra={"model": self.model})
         except Exception as e:
             self.available = False
-            print(f"[ai_chat] Failed to configure google.generativeai: {e}")
+            logger.exception(f"Failed to configure google.generativeai: {e}")
 
     # ---------- helper ----------
     def _is_allowed(self, user: discord.User | discord.Member) -> bool:
@@ -156,6 +160,7 @@ class AIChatCog(commands.Cog, name="AI Chat (Gemini)"):
                 await interaction.followup.send(content="Full response attached:", file=discord_file)
 
         except Exception as e:
+            logger.exception(f"Gemini API error: {e}", extra={"model": self.model})
             # return helpful diagnostic to the user (don't leak sensitive info)
             await interaction.followup.send(f"❌ Gemini API error: {e}", ephemeral=True)
 
@@ -10,6 +10,12 @@ import re
 import json
 import html
 
+import log
+from cogs._booking_guards import (load_open_tickets, set_ticket_open, forget_submissions, forget_ticket, open_ticket_limit_message,
+                                  submission_key, find_recent_submission, throttle_retry_after, claim_submission)
+
+logger = log.get_logger("booking")
+
 # --- Environment & Configuration ---
 if not os.path.exists('./data'):
     os.makedirs('./data')
@@ -27,7 +33,7 @@ def load_config():
     try:
         with open(CONFIG_FILE_PATH, 'r') as f:
             GUILD_CONFIG = {int(k): v for k, v in json.load(f).items()}
-            print("Successfully loaded persistent booking configuration.")
+            logger.info("Successfully loaded persistent booking configuration.", extra={"guilds": len(GUILD_CONFIG)})
     except (FileNotFoundError, json.JSONDecodeError):
         GUILD_CONFIG = {}
 
@@ -54,14 +60,22 @@ class ArtistBooking(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         load_config()
+        load_open_tickets()
         self.bot.add_view(self.CreateBookingView(self))
         self.bot.add_view(self.BookingControlView(self))
         self.bot.add_view(self.ClosedTicketView(self)) # Add the new view
 
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        # Covers ticket channels deleted by hand; the data file is kept, as before
+        if os.path.exists(f"./data/{channel.id}.json"):
+            forget_ticket(channel.id)
+            logger.info("Ticket channel deleted", extra={"channel_id": channel.id})
+
     # --- UI Components as Inner Classes ---
     class BookingFormModal(discord.ui.Modal, title="🎤 Artist Booking Form"):
         # This modal is stable and does not need changes.
-        def __init__(self, cog_instance): super().__init__(); self.cog = cog_instance
+        def __init__(self, cog_instance, trace_id=None): super().__init__(); self.cog = cog_instance; self.trace_id = trace_id
         event_name = discord.ui.TextInput(label="Event Name", placeholder="e.g., Starlight Music Festival")
         event_date = discord.ui.TextInput(label="Proposed Date & Time", placeholder="e.g., 25 Dec 2025 at 9:00 PM IST")
         venue = discord.ui.TextInput(label="Venue / Location", placeholder="e.g., Discord Server / Mumbai, India")
@@ -69,21 +83,48 @@ class ArtistBooking(commands.Cog):
         description = discord.ui.TextInput(label="Event Details", style=discord.TextStyle.paragraph, required=False)
 
         async def on_submit(self, interaction: discord.Interaction):
-            await interaction.response.defer(ephemeral=True)
+            # Continue the trace started by the "Book The Artist" click
+            log.start_trace(self.trace_id)
+            logger.info("Booking form submitted", extra={"user_id": interaction.user.id, "guild_id": interaction.guild.id})
+            # Guards run before defer so rejections are answered instantly and cost no API calls
+            key = submission_key(interaction.user.id, [self.event_name.value, self.event_date.value, self.venue.value, self.budget.value, self.description.value])
+            if recent := find_recent_submission(key):
+                logger.info("Duplicate booking submission rejected", extra={"channel_id": recent[0]})
+                if recent[0] is None: return await interaction.response.send_message("⏳ This booking is already being created, hang tight!", ephemeral=True)
+                return await interaction.response.send_message(f"✅ You already submitted this booking: <#{recent[0]}>", ephemeral=True)
+            if message := open_ticket_limit_message(self.cog.bot, interaction.user.id):
+                logger.info("Booking rejected at open-ticket cap", extra={"user_id": interaction.user.id})
+                return await interaction.response.send_message(message, ephemeral=True)
             config = GUILD_CONFIG.get(interaction.guild.id)
-            if not config: return await interaction.followup.send("❌ **Error:** Booking system misconfigured.", ephemeral=True)
+            if not config: return await interaction.response.send_message("❌ **Error:** Booking system misconfigured.", ephemeral=True)
             category = interaction.guild.get_channel(config['category_id'])
-            if not category: return await interaction.followup.send("❌ **Error:** Configured category not found.", ephemeral=True)
+            if not category: return await interaction.response.send_message("❌ **Error:** Configured category not found.", ephemeral=True)
+            # Throttle last so a misconfigured guild doesn't burn the user's tokens
+            if (retry_after := throttle_retry_after(interaction.user.id)) is not None:
+                logger.info("Booking submission throttled", extra={"user_id": interaction.user.id})
+                return await interaction.response.send_message(f"⏳ You're submitting too quickly. Try again in {int(retry_after) + 1} seconds.", ephemeral=True)
+
+            # Claim the dedupe key and a cap slot before the first await so concurrent submits see them
+            with claim_submission(key, interaction.user.id) as submission:
+                await self.create_ticket(interaction, category, submission)
+
+        async def create_ticket(self, interaction: discord.Interaction, category: discord.CategoryChannel, submission: list):
+            await interaction.response.defer(ephemeral=True)
             overwrites = {interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False), interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True)}
             for admin_id in ADMIN_IDS:
                 if admin := interaction.guild.get_member(admin_id): overwrites[admin] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
             ticket_channel = await category.create_text_channel(f"booking-{interaction.user.display_name}", overwrites=overwrites)
+            logger.info("Ticket channel created", extra={"channel_id": ticket_channel.id})
             ticket_data = {"requester_id": interaction.user.id, "status": "pending", "event_name": self.event_name.value, "event_date": self.event_date.value, "venue": self.venue.value, "budget": self.budget.value, "description": self.description.value}
             with open(f"./data/{ticket_channel.id}.json", 'w') as f: json.dump(ticket_data, f, indent=4)
+            logger.info("Ticket data written", extra={"channel_id": ticket_channel.id, "status": "pending"})
+            submission[0] = ticket_channel.id
+            set_ticket_open(interaction.user.id, ticket_channel.id, True)
             embed = discord.Embed(title=f"🎶 Booking Request: {self.event_name.value}", color=discord.Color.gold())
             embed.add_field(name="👤 Requester", value=interaction.user.mention, inline=False).add_field(name="🗓️ Date & Time", value=self.event_date.value).add_field(name="📍 Venue", value=self.venue.value).add_field(name="💰 Budget (INR)", value=self.budget.value)
             if self.description.value: embed.add_field(name="📝 Details", value=self.description.value, inline=False)
             await ticket_channel.send(embed=embed, view=self.cog.BookingControlView(self.cog))
+            logger.info("Booking request posted", extra={"channel_id": ticket_channel.id})
             await interaction.followup.send(f"✅ **Success!** Your ticket is at {ticket_channel.mention}", ephemeral=True)
 
     class CreateBookingView(discord.ui.View):
@@ -93,13 +134,17 @@ class ArtistBooking(commands.Cog):
         # FIX: Added custom emoji
         @discord.ui.button(label="Book The Artist", style=discord.ButtonStyle.primary, custom_id="create_booking_persistent_final", emoji="<a:ticket_shiny:1423897615228997683>")
         async def create_booking(self, interaction: discord.Interaction, button: discord.ui.Button):
+            trace_id = log.start_trace()
+            logger.info("Booking button clicked", extra={"user_id": interaction.user.id, "guild_id": interaction.guild.id})
             if interaction.guild.id not in GUILD_CONFIG:
                 return await interaction.response.send_message("❌ **Error:** Booking system not configured.", ephemeral=True)
-            await interaction.response.send_modal(self.cog.BookingFormModal(self.cog))
+            if message := open_ticket_limit_message(self.cog.bot, interaction.user.id):
+                return await interaction.response.send_message(message, ephemeral=True)
+            await interaction.response.send_modal(self.cog.BookingFormModal(self.cog, trace_id))
 
     class ApprovalFormModal(discord.ui.Modal, title="Confirm & Approve Booking"):
-        def __init__(self, current_data: dict, original_message: discord.Message):
-            super().__init__(); self.current_data = current_data; self.original_message = original_message
+        def __init__(self, current_data: dict, original_message: discord.Message, trace_id=None):
+            super().__init__(); self.current_data = current_data; self.original_message = original_message; self.trace_id = trace_id
             self.event_name = discord.ui.TextInput(label="Event Name", default=current_data.get('event_name'))
             self.event_date = discord.ui.TextInput(label="Date & Time", default=current_data.get('event_date'))
             self.venue = discord.ui.TextInput(label="Venue / Location", default=current_data.get('venue'))
@@ -107,9 +152,12 @@ class ArtistBooking(commands.Cog):
             self.add_item(self.event_name); self.add_item(self.event_date); self.add_item(self.venue); self.add_item(self.budget)
 
         async def on_submit(self, interaction: discord.Interaction):
+            log.start_trace(self.trace_id)
             await interaction.response.defer(ephemeral=True)
             self.current_data.update({'event_name': self.event_name.value, 'event_date': self.event_date.value, 'venue': self.venue.value, 'budget': self.budget.value, 'status': 'approved'})
             with open(f"./data/{interaction.channel.id}.json", 'w') as f: json.dump(self.current_data, f, indent=4)
+            logger.info("Ticket data written", extra={"channel_id": interaction.channel.id, "status": "approved"})
+            set_ticket_open(self.current_data['requester_id'], interaction.channel.id, False)
             
             view = self.original_message.view; [setattr(item, 'disabled', True) for item in view.children]; await self.original_message.edit(view=view)
             
@@ -121,19 +169,23 @@ class ArtistBooking(commands.Cog):
             
             user_mention = requester.mention if requester else f"<@{self.current_data['requester_id']}>"
             await interaction.channel.send(content=f"Congratulations {user_mention}, your booking is confirmed!", embed=embed)
+            logger.info("Booking approval posted", extra={"channel_id": interaction.channel.id})
             await interaction.followup.send("✅ Booking approved.", ephemeral=True)
 
     class DenialReasonModal(discord.ui.Modal, title="Deny Booking"):
         # This modal is stable and does not need changes.
-        def __init__(self, current_data: dict, original_message: discord.Message):
-            super().__init__(); self.current_data = current_data; self.original_message = original_message
+        def __init__(self, current_data: dict, original_message: discord.Message, trace_id=None):
+            super().__init__(); self.current_data = current_data; self.original_message = original_message; self.trace_id = trace_id
             self.reason = discord.ui.TextInput(label="Reason for Denial (Optional)", style=discord.TextStyle.paragraph, required=False)
             self.add_item(self.reason)
         
         async def on_submit(self, interaction: discord.Interaction):
+            log.start_trace(self.trace_id)
             await interaction.response.defer(ephemeral=True)
             self.current_data.update({'status': 'denied'})
             with open(f"./data/{interaction.channel.id}.json", 'w') as f: json.dump(self.current_data, f, indent=4)
+            logger.info("Ticket data written", extra={"channel_id": interaction.channel.id, "status": "denied"})
+            set_ticket_open(self.current_data['requester_id'], interaction.channel.id, False)
             view = self.original_message.view; [setattr(item, 'disabled', True) for item in view.children]; await self.original_message.edit(view=view)
             requester = interaction.guild.get_member(self.current_data['requester_id'])
             if requester: await interaction.channel.set_permissions(requester, send_messages=False)
@@ -141,6 +193,7 @@ class ArtistBooking(commands.Cog):
             if self.reason.value: embed.add_field(name="Reason", value=self.reason.value)
             user_mention = requester.mention if requester else f"<@{self.current_data['requester_id']}>"
             await interaction.channel.send(content=user_mention, embed=embed)
+            logger.info("Booking denial posted", extra={"channel_id": interaction.channel.id})
             await interaction.followup.send("Booking denied.", ephemeral=True)
 
     # --- TICKET CONTROL VIEWS ---
@@ -150,6 +203,8 @@ class ArtistBooking(commands.Cog):
             self.cog = cog_instance
         
         async def interaction_check(self, interaction: discord.Interaction) -> bool:
+            log.start_trace()
+            logger.info("Ticket control used", extra={"custom_id": interaction.data.get("custom_id"), "channel_id": interaction.channel_id, "user_id": interaction.user.id})
             if interaction.user.id not in ADMIN_IDS:
                 await interaction.response.send_message("❌ **Access Denied** | You are not an authorized booking manager.", ephemeral=True)
                 return False
@@ -160,7 +215,7 @@ class ArtistBooking(commands.Cog):
             try:
                 with open(f"./data/{interaction.channel.id}.json", 'r') as f: current_data = json.load(f)
                 if current_data['status'] != 'pending': return await interaction.response.send_message("This ticket has already been actioned.", ephemeral=True)
-                await interaction.response.send_modal(self.cog.ApprovalFormModal(current_data, interaction.message))
+                await interaction.response.send_modal(self.cog.ApprovalFormModal(current_data, interaction.message, log.get_trace_id()))
             except FileNotFoundError: await interaction.response.send_message("❌ Error: Could not find data for this ticket.", ephemeral=True)
 
             embed = discord.Embed(description=f"Ticket Approved by {interaction.user.mention}", color=discord.Color.dark_blue())
@@ -172,7 +227,7 @@ class ArtistBooking(commands.Cog):
             try:
                 with open(f"./data/{interaction.channel.id}.json", 'r') as f: current_data = json.load(f)
                 if current_data['status'] != 'pending': return await interaction.response.send_message("This ticket has already been actioned.", ephemeral=True)
-                await interaction.response.send_modal(self.cog.DenialReasonModal(current_data, interaction.message))
+                await interaction.response.send_modal(self.cog.DenialReasonModal(current_data, interaction.message, log.get_trace_id()))
             except FileNotFoundError: await interaction.response.send_message("❌ Error: Could not find data for this ticket.", ephemeral=True)
         
         @discord.ui.button(label="Close", style=discord.ButtonStyle.secondary, custom_id="booking_close_final", emoji="🔒")
@@ -185,6 +240,9 @@ class ArtistBooking(commands.Cog):
                     data = json.load(f)
                     data['status'] = 'closed'
                     f.seek(0); json.dump(data, f, indent=4); f.truncate()
+                    logger.info("Ticket data written", extra={"channel_id": interaction.channel.id, "status": "closed"})
+                    set_ticket_open(data['requester_id'], interaction.channel.id, False)
+                    forget_submissions(interaction.channel.id)
                     requester = interaction.guild.get_member(data['requester_id'])
                     if requester:
                         await interaction.channel.set_permissions(requester, view_channel=False)
@@ -201,6 +259,8 @@ class ArtistBooking(commands.Cog):
             self.cog = cog_instance
         
         async def interaction_check(self, interaction: discord.Interaction) -> bool:
+            log.start_trace()
+            logger.info("Ticket control used", extra={"custom_id": interaction.data.get("custom_id"), "channel_id": interaction.channel_id, "user_id": interaction.user.id})
             if interaction.user.id not in ADMIN_IDS:
                 await interaction.response.send_message("❌ **Access Denied** | You are not an authorized booking manager.", ephemeral=True)
                 return False
@@ -214,6 +274,8 @@ class ArtistBooking(commands.Cog):
                     data = json.load(f)
                     data['status'] = 'pending'
                     f.seek(0); json.dump(data, f, indent=4); f.truncate()
+                    logger.info("Ticket data written", extra={"channel_id": interaction.channel.id, "status": "pending"})
+                    set_ticket_open(data['requester_id'], interaction.channel.id, True)
                     requester = interaction.guild.get_member(data['requester_id'])
                     if requester:
                         await interaction.channel.set_permissions(requester, view_channel=True)
@@ -231,9 +293,10 @@ class ArtistBooking(commands.Cog):
         @discord.ui.button(label="Delete", style=discord.ButtonStyle.danger, custom_id="booking_delete_final", emoji="⛔")
         async def delete(self, interaction: discord.Interaction, button: discord.ui.Button):
             await interaction.response.send_message("⛔ Deleting this ticket permanently...")
-            ticket_file_path = f"./data/{interaction.channel.id}.json"
             await asyncio.sleep(3)
+            ticket_file_path = f"./data/{interaction.channel.id}.json"
             await interaction.channel.delete()
+            forget_ticket(interaction.channel.id)
             if os.path.exists(ticket_file_path): os.remove(ticket_file_path)
 
     booking_group = app_commands.Group(name="booking", description="Commands for the artist booking system.")
@@ -2,6 +2,10 @@ import discord
 from discord.ext import commands
 from os import getenv
 
+import log
+
+logger = log.get_logger("messenger")
+
 OWNER_ID = 741140140201607268  # your Discord ID
 
 
@@ -27,6 +31,7 @@ class ActCog(commands.Cog):
             return
 
         sent_msg = await channel.send(text)
+        logger.info("Message sent to channel", extra={"channel_id": channel.id, "message_id": sent_msg.id})
         await ctx.send(f"✅ Message sent to {channel.mention}!")
         # keep track of the sent message
         self.message_map[sent_msg.id] = (channel.id, None)
@@ -49,6 +54,8 @@ class ActCog(commands.Cog):
                         channel_id, user_id = mapped
                         channel = self.bot.get_channel(channel_id)
                         if channel:
+                            log.start_trace()
+                            logger.info("Relaying admin DM reply to channel", extra={"channel_id": channel_id, "user_id": user_id})
                             if user_id:
                                 user_mention = f"<@{user_id}>"
                                 await channel.send(f"{user_mention} {message.content}")
@@ -60,6 +67,8 @@ class ActCog(commands.Cog):
         if self.bot.user in message.mentions or (
             message.reference and getattr(message.reference.resolved, "author", None) == self.bot.user
         ):
+            log.start_trace()
+            logger.info("Relaying mention to owner", extra={"channel_id": message.channel.id, "user_id": message.author.id})
             owner = await self.bot.fetch_user(OWNER_ID)
 
             embed = discord.Embed(
@@ -73,6 +82,7 @@ class ActCog(commands.Cog):
             embed.set_footer(text=f"Channel ID: {message.channel.id}")
 
             dm_msg = await owner.send(embed=embed)
+            logger.info("Mention relayed to owner", extra={"dm_message_id": dm_msg.id})
             # Map the DM message ID → (channel_id, user_id)
             self.message_map[dm_msg.id] = (message.channel.id, message.author.id)
 
@@ -0,0 +1,292 @@
+# ipc.py — local RPC between the bot process and a separate web front process
+#
+# Wire format: one JSON object per line over a Unix domain socket.
+#   request:  {"id": 1, "method": "send_message", "params": {...}, "trace_id": "..."}
+#   response: {"id": 1, "result": {...}, "status": 200}
+# Requests are pipelined: the client may have many in flight on one connection
+# and the server answers them in whatever order they finish, matched by "id".
+import os
+import json
+import time
+import socket
+import asyncio
+import itertools
+import threading
+
+import log
+
+logger = log.get_logger("ipc")
+
+MAX_LINE_BYTES = 1024 * 1024
+
+
+# Read when a server/client is created rather than at import, so .env is loaded by then
+def socket_path() -> str:
+    return os.getenv("BOT_IPC_SOCKET", "./data/bot.sock")
+
+def client_timeout() -> float:
+    return float(os.getenv("BOT_IPC_TIMEOUT", 10))
+
+def server_timeout() -> float:
+    """Comfortably past the client's, so the bot never abandons a send the web side is still waiting on."""
+    return float(os.getenv("BOT_IPC_SERVER_TIMEOUT", client_timeout() * 3))
+
+
+class IPCError(Exception):
+    """The bot could not be reached or dropped the connection."""
+
+
+class IPCTimeout(IPCError):
+    """The bot did not answer within the timeout."""
+
+
+class _LatencyStats:
+    """Running round-trip numbers; the smoothed value is an EWMA (alpha=0.2)."""
+
+    def __init__(self):
+        self.count = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        self.count += 1
+        self.last_ms = ms
+        self.avg_ms = ms if self.count == 1 else self.avg_ms * 0.8 + ms * 0.2
+        self.max_ms = max(self.max_ms, ms)
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "last_ms": round(self.last_ms, 2), "avg_ms": round(self.avg_ms, 2), "max_ms": round(self.max_ms, 2)}
+
+
+# =================================================================================
+# BOT SIDE: asyncio server living on the bot's event loop
+# =================================================================================
+class IPCServer:
+    def __init__(self, worker, path: str = None, timeout: float = None):
+        self.worker = worker
+        self.path = path or socket_path()
+        self.timeout = timeout or server_timeout()
+        self.in_flight = 0
+        self.errors = 0
+        self.latency = _LatencyStats()
+        self._server = None
+        self._writers = set()
+        self._tasks = set()
+
+    async def start(self):
+        """Bind the socket (replacing a stale one) and start accepting clients."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            if await self._socket_in_use():
+                raise IPCError(f"Another bot is already listening on {self.path}")
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.path, limit=MAX_LINE_BYTES)
+        logger.info(f"IPC server listening on {self.path}")
+
+    async def _socket_in_use(self) -> bool:
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        writer.close()
+        return True
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            # Drop live clients too so they notice and reconnect to the next server
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def stats(self) -> dict:
+        return {"queue_depth": self.in_flight, "errors": self.errors, "latency": self.latency.as_dict()}
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = None
+                if not isinstance(request, dict):
+                    self.errors += 1
+                    continue
+                # Each request runs as its own task so a slow one doesn't hold up the pipe
+                task = asyncio.create_task(self._serve(request, writer, write_lock))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.warning(f"Client connection dropped: {e}")
+        finally:
+            # In-flight requests keep running: a web worker going away must not cut off a Discord send
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _serve(self, request: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        log.start_trace(request.get("trace_id"))
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            result, status = await asyncio.wait_for(self._dispatch(request.get("method"), request.get("params")), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            result, status = {"error": "Bot timed out processing request"}, 504
+        except Exception as e:
+            self.errors += 1
+            logger.exception(f"Error handling {request.get('method')}: {e}", extra={"method": request.get("method")})
+            result, status = {"error": "Failed to process request"}, 500
+        finally:
+            self.in_flight -= 1
+            self.latency.record(time.perf_counter() - started)
+
+        payload = json.dumps({"id": request.get("id"), "result": result, "status": status}).encode() + b"\n"
+        if writer.is_closing():
+            return
+        async with write_lock:
+            try:
+                writer.write(payload)
+                await writer.drain()
+            except (ConnectionError, RuntimeError):
+                pass
+
+    async def _dispatch(self, method: str, params):
+        if method == "send_message":
+            return await self.worker.handle_admin_message(params)
+        if method == "webhook":
+            handler = getattr(self.worker, "handle_webhook", None)
+            if handler is None:
+                return {"received": True}, 200
+            return await handler(params)
+        if method == "stats":
+            return self.stats(), 200
+        return {"error": f"Unknown method: {method}"}, 400
+
+
+# =================================================================================
+# WEB SIDE: thread-safe blocking client for Flask worker threads
+# =================================================================================
+class _Pending:
+    __slots__ = ("sock", "event", "response")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.event = threading.Event()
+        self.response = None
+
+
+class IPCClient:
+    """One shared connection per process; calls from any thread are pipelined over it.
+
+    The socket is opened lazily on the first call (so the client is safe to create
+    before a pre-forking server forks) and reopened on the next call after it drops.
+    """
+
+    def __init__(self, path: str = None, timeout: float = None, connect_retries: int = 3):
+        self.path = path or socket_path()
+        self.timeout = timeout or client_timeout()
+        self.connect_retries = connect_retries
+        self.timeouts = 0
+        self.reconnects = 0
+        self.latency = _LatencyStats()
+        self._ids = itertools.count(1)
+        self._pending: dict[int, _Pending] = {}
+        self._conn_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._sock = None
+        self._connected_once = False
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {"connected": self._sock is not None, "queue_depth": self.queue_depth, "timeouts": self.timeouts, "reconnects": self.reconnects, "latency": self.latency.as_dict()}
+
+    def call(self, method: str, params=None, timeout: float = None) -> tuple[dict, int]:
+        """Send one request and block until its response arrives; returns (result, status)."""
+        sock = self._ensure_connected()
+        request_id = next(self._ids)
+        pending = self._pending[request_id] = _Pending(sock)
+        payload = json.dumps({"id": request_id, "method": method, "params": params, "trace_id": log.get_trace_id()}).encode() + b"\n"
+
+        started = time.perf_counter()
+        try:
+            with self._send_lock:
+                sock.sendall(payload)
+        except OSError as e:
+            self._pending.pop(request_id, None)
+            self._drop(sock)
+            raise IPCError(f"Send failed: {e}") from e
+
+        if not pending.event.wait(timeout or self.timeout):
+            self._pending.pop(request_id, None)
+            self.timeouts += 1
+            raise IPCTimeout(f"No reply to {method} within {timeout or self.timeout}s")
+        self.latency.record(time.perf_counter() - started)
+
+        if pending.response is None:
+            raise IPCError("Connection to bot lost")
+        return pending.response.get("result"), pending.response.get("status", 500)
+
+    def _ensure_connected(self) -> socket.socket:
+        with self._conn_lock:
+            if self._sock is not None:
+                return self._sock
+            delay = 0.1
+            for attempt in range(self.connect_retries):
+                sock = None
+                try:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.connect(self.path)
+                    break
+                except OSError as e:
+                    if sock is not None:
+                        sock.close()
+                    if attempt == self.connect_retries - 1:
+                        raise IPCError(f"Cannot reach bot at {self.path}: {e}") from e
+                    time.sleep(delay)
+                    delay *= 2
+            if self._connected_once:
+                self.reconnects += 1
+            self._connected_once = True
+            self._sock = sock
+            threading.Thread(target=self._read_loop, args=(sock,), daemon=True).start()
+            return sock
+
+    def _read_loop(self, sock: socket.socket):
+        try:
+            with sock.makefile("rb") as stream:
+                for line in stream:
+                    try:
+                        response = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if not isinstance(response, dict):
+                        continue
+                    pending = self._pending.pop(response.get("id"), None)
+                    if pending:
+                        pending.response = response
+                        pending.event.set()
+        except OSError:
+            pass
+        self._drop(sock)
+
+    def _drop(self, sock: socket.socket):
+        """Forget a dead connection and wake every caller still waiting on it."""
+        with self._conn_lock:
+            if self._sock is sock:
+                self._sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+        for request_id, pending in list(self._pending.items()):
+            if pending.sock is sock and self._pending.pop(request_id, None):
+                pending.event.set()
@@ -0,0 +1,116 @@
+# log.py — structured, non-blocking logging with per-interaction trace ids
+#
+# Records are stamped with the current trace id on the calling thread, pushed onto
+# an in-memory queue, and written out as one JSON object per line by a background
+# thread, so the event loop never waits on stdout.
+import sys
+import json
+import copy
+import uuid
+import atexit
+import logging
+import datetime
+import contextvars
+import logging.handlers
+from queue import SimpleQueue
+
+trace_id_var = contextvars.ContextVar("trace_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "trace_id"}
+
+_listener = None
+_queue_handler = None
+
+
+# --- Trace ids ---
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def start_trace(trace_id: str = None) -> str:
+    """Sets the trace id for the current context (task or thread) and returns it."""
+    trace_id = trace_id or new_trace_id()
+    trace_id_var.set(trace_id)
+    return trace_id
+
+def get_trace_id():
+    return trace_id_var.get()
+
+async def traced(coro, trace_id: str):
+    """Awaits `coro` under `trace_id`; for handing work to another thread's event loop."""
+    start_trace(trace_id)
+    return await coro
+
+
+# --- Handlers & formatting ---
+class _TraceFilter(logging.Filter):
+    """Captures the trace id while still on the thread that emitted the record."""
+
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Like QueueHandler, but keeps the traceback in its own field instead of folding it into msg."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+def setup_logging(level=logging.INFO, stream=sys.stdout):
+    """Routes the `onlygpay` loggers through a queue drained by a background thread. Safe to call twice."""
+    global _listener, _queue_handler
+    if _listener:
+        return
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JSONFormatter())
+
+    log_queue = SimpleQueue()
+    _queue_handler = _QueueHandler(log_queue)
+    _queue_handler.addFilter(_TraceFilter())
+
+    root = logging.getLogger("onlygpay")
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.addHandler(_queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Flushes whatever is still queued and stops the writer thread."""
+    global _listener, _queue_handler
+    if _queue_handler:
+        # Detach first so nothing keeps filling a queue nobody drains
+        logging.getLogger("onlygpay").removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"onlygpay.{name}")
@@ -3,15 +3,28 @@ import os
 import asyncio
 import discord
 from discord.ext import commands
+from discord import app_commands
 from dotenv import load_dotenv
 
+import log
+
 # Import the web server and the web worker modules
 import web
+import ipc
 import cogs.web_worker
 
+logger = log.get_logger("main")
+
 # =================================================================================
 # DEFINE THE BOT'S CLASS
 # =================================================================================
+class TracedCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Runs in the same task as the slash command, so the trace id follows it."""
+        log.start_trace()
+        logger.info("Slash command invoked", extra={"command": interaction.command.qualified_name if interaction.command else None, "user_id": interaction.user.id, "guild_id": interaction.guild_id})
+        return True
+
 class OnlyGPayBot(commands.Bot):
     def __init__(self):
         # Define intents
@@ -22,11 +35,17 @@ class OnlyGPayBot(commands.Bot):
         intents.guilds = True 
 
         # Initialize bot
-        super().__init__(command_prefix='gpay ', intents=intents)
+        super().__init__(command_prefix='gpay ', intents=intents, tree_cls=TracedCommandTree)
+        self.before_invoke(self.start_command_trace)
+
+    async def start_command_trace(self, ctx: commands.Context):
+        """Gives each prefix command its own trace id."""
+        log.start_trace()
+        logger.info("Prefix command invoked", extra={"command": ctx.command.qualified_name, "user_id": ctx.author.id})
 
     async def load_cogs(self):
         """Dynamically load all cogs, ensuring core cogs are loaded first."""
-        print("Loading cogs...")
+        logger.info("Loading cogs...")
 
         # Cogs to load first (e.g., core services)
         core_cogs_to_load_first = [
@@ -43,10 +62,10 @@ class OnlyGPayBot(commands.Bot):
         for cog_name in core_cogs_to_load_first:
             try:
                 await self.load_extension(f'cogs.{cog_name}')
-                print(f'-> Loaded Core Cog: {cog_name}.py')
+                logger.info(f'-> Loaded Core Cog: {cog_name}.py', extra={"cog": cog_name})
                 loaded_filenames.append(f'{cog_name}.py')
             except Exception as e:
-                print(f'[ERROR] Failed to load core cog {cog_name.py}: {e}')
+                logger.exception(f'Failed to load core cog {cog_name}.py: {e}', extra={"cog": cog_name})
 
         # Load all other cogs dynamically
         for filename in os.listdir('./cogs'):
@@ -54,39 +73,37 @@ class OnlyGPayBot(commands.Bot):
             if filename.endswith('.py') and not filename.startswith('_') and filename not in loaded_filenames:
                 try:
                     await self.load_extension(f'cogs.{filename[:-3]}')
-                    print(f'-> Loaded Cog: {filename}')
+                    logger.info(f'-> Loaded Cog: {filename}', extra={"cog": filename[:-3]})
                 except Exception as e:
-                    print(f'[ERROR] Failed to load cog {filename}: {e}')
+                    logger.exception(f'Failed to load cog {filename}: {e}', extra={"cog": filename[:-3]})
 
     async def setup_hook(self):
         """Runs after login but before full connection."""
-        print("Running setup hook...")
+        logger.info("Running setup hook...")
         await self.load_cogs()
         try:
             # Sync global commands
             synced = await self.tree.sync()
-            print(f"Synced {len(synced)} slash command(s).")
+            logger.info(f"Synced {len(synced)} slash command(s).")
         except Exception as e:
-            print(f"Failed to sync slash commands: {e}")
+            logger.exception(f"Failed to sync slash commands: {e}")
 
     async def on_ready(self):
         """Called when the bot is ready and online."""
-        print("-" * 30)
-        print(f'{self.user.name} has connected to Discord!')
-        print(f'User ID: {self.user.id}')
-        print("-" * 30)
+        logger.info(f'{self.user.name} has connected to Discord!', extra={"user_id": self.user.id})
 
 # =================================================================================
 # MAIN ASYNC FUNCTION TO RUN THE BOT
 # =================================================================================
 async def main():
     load_dotenv()
-    print("Loading environment variables...")
+    log.setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    logger.info("Loading environment variables...")
 
     DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 
     if not DISCORD_TOKEN:
-        print("CRITICAL: DISCORD_TOKEN not found in .env file. Bot cannot start.")
+        logger.critical("DISCORD_TOKEN not found in .env file. Bot cannot start.")
         return
 
     # Get the main asyncio event loop
@@ -98,19 +115,29 @@ async def main():
     # --- Setup Web Components ---
     # Pass the bot instance to the web_worker so it can send messages
     cogs.web_worker.setup(bot)
-    print("Web worker has received the bot instance.")
-
-    # Pass the event loop and the worker module to the web server
-    web.setup(loop, cogs.web_worker)
-    print("Web server has received the event loop and web worker.")
+    logger.info("Web worker has received the bot instance.")
 
-    # Start the Flask web server in a separate thread
-    try:
-        web.start_thread() 
-        print("✅ Flask web server started successfully.")
-    except Exception as e:
-        print(f"⚠️ Failed to start web server: {e}")
-        return # Can't continue if the web server fails
+    if os.getenv("WEB_MODE") == "ipc":
+        # The web front runs as its own process (python web.py) and reaches us here
+        ipc_server = ipc.IPCServer(cogs.web_worker)
+        try:
+            await ipc_server.start()
+            logger.info("IPC server started; run web.py separately with WEB_MODE=ipc.")
+        except Exception as e:
+            logger.critical(f"Failed to start IPC server: {e}")
+            return
+    else:
+        # Pass the event loop and the worker module to the web server
+        web.setup(loop, cogs.web_worker)
+        logger.info("Web server has received the event loop and web worker.")
+
+        # Start the Flask web server in a separate thread
+        try:
+            web.start_thread() 
+            logger.info("Flask web server started successfully.")
+        except Exception as e:
+            logger.critical(f"Failed to start web server: {e}")
+            return # Can't continue if the web server fails
 
     # Start the bot
     await bot.start(DISCORD_TOKEN)
@@ -122,4 +149,4 @@ if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("Bot stopped manually.")
\ No newline at end of file
+        logger.info("Bot stopped manually.")
\ No newline at end of file
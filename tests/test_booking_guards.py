@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs import _booking_guards as guards
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBot:
+    def __init__(self, channels=(), ready=True):
+        self.channels = set(channels)
+        self.ready = ready
+
+    def is_ready(self):
+        return self.ready
+
+    def get_channel(self, channel_id):
+        return object() if channel_id in self.channels else None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(guards.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    for state in (guards.OPEN_TICKETS, guards.CREATING_TICKETS, guards.RECENT_SUBMISSIONS, guards.THROTTLES):
+        state.clear()
+    monkeypatch.setattr(guards, "MAX_OPEN_TICKETS", 1)
+    monkeypatch.setattr(guards, "DEDUPE_WINDOW", 600)
+    yield
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket = guards.TokenBucket(capacity=2, refill_seconds=10)
+    assert bucket.consume() and bucket.consume()
+    assert not bucket.consume()
+    assert bucket.retry_after() == pytest.approx(10)
+
+    clock.now += 4
+    assert bucket.retry_after() == pytest.approx(6)
+    clock.now += 6
+    assert bucket.consume()
+    clock.now += 100
+    assert bucket.is_full() and bucket.tokens == 2
+
+
+def test_submission_key_normalizes_whitespace_and_case():
+    key = guards.submission_key(1, ["  Starlight   Fest ", "25 DEC", ""])
+    assert key == guards.submission_key(1, ["starlight fest", "25 dec", ""])
+    assert key != guards.submission_key(2, ["starlight fest", "25 dec", ""])
+    # Field boundaries matter: moving text between fields is a different form
+    assert guards.submission_key(1, ["ab", "c"]) != guards.submission_key(1, ["a", "bc"])
+
+
+def test_submissions_expire_after_window_but_not_while_creating(clock):
+    done, creating = ("done",), ("creating",)
+    guards.RECENT_SUBMISSIONS[done] = [42, clock.now]
+    guards.RECENT_SUBMISSIONS[creating] = [None, clock.now]
+
+    clock.now += 599
+    assert guards.find_recent_submission(done) == [42, 1000.0]
+    clock.now += 2
+    assert guards.find_recent_submission(done) is None
+    assert guards.find_recent_submission(creating) == [None, 1000.0]
+
+
+def test_zero_window_keeps_in_progress_entry(clock, monkeypatch):
+    monkeypatch.setattr(guards, "DEDUPE_WINDOW", 0)
+    key = guards.submission_key(1, ["a"])
+    with guards.claim_submission(key, 1) as entry:
+        clock.now += 5
+        guards.find_recent_submission(("someone", "else"))
+        entry[0] = 99
+    assert guards.RECENT_SUBMISSIONS[key] == [99, 1000.0]
+
+
+def test_full_throttles_are_evicted_on_prune(clock, monkeypatch):
+    monkeypatch.setattr(guards, "THROTTLE_CAPACITY", 2)
+    monkeypatch.setattr(guards, "THROTTLE_REFILL", 10)
+    assert guards.throttle_retry_after(1) is None
+    guards.prune_submissions()
+    assert 1 in guards.THROTTLES
+    clock.now += 10
+    guards.prune_submissions()
+    assert 1 not in guards.THROTTLES
+
+
+def test_cap_counts_in_flight_reservations():
+    bot = FakeBot()
+    key = guards.submission_key(1, ["a"])
+    assert guards.open_ticket_limit_message(bot, 1) is None
+    with guards.claim_submission(key, 1):
+        # A second, different submission racing the first is held at the cap
+        assert "being created" in guards.open_ticket_limit_message(bot, 1)
+    assert guards.CREATING_TICKETS == {}
+    assert guards.open_ticket_limit_message(bot, 1) is None
+
+
+def test_claim_released_on_exception():
+    key = guards.submission_key(1, ["a"])
+    with pytest.raises(RuntimeError):
+        with guards.claim_submission(key, 1):
+            raise RuntimeError("channel creation failed")
+    assert guards.CREATING_TICKETS == {}
+    assert key not in guards.RECENT_SUBMISSIONS
+
+
+def test_missing_channels_leave_index_but_files_stay(tmp_path):
+    (tmp_path / "10.json").write_text(json.dumps({"requester_id": 1, "status": "pending"}))
+    (tmp_path / "11.json").write_text(json.dumps({"requester_id": 2, "status": "closed"}))
+    guards.load_open_tickets(str(tmp_path))
+    assert guards.OPEN_TICKETS == {1: {10}}
+
+    # Not ready yet: the channel may just be uncached, so nothing is pruned
+    assert guards.open_ticket_limit_message(FakeBot(ready=False), 1) is not None
+    assert "<#10>" in guards.open_ticket_limit_message(FakeBot({10}), 1)
+    assert guards.open_ticket_limit_message(FakeBot(), 1) is None
+    assert guards.OPEN_TICKETS == {}
+    assert (tmp_path / "10.json").exists()
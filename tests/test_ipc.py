@@ -0,0 +1,164 @@
+import os
+import sys
+import socket
+import asyncio
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ipc
+
+
+class FakeWorker:
+    async def handle_admin_message(self, data):
+        await asyncio.sleep(data.get("delay", 0))
+        return {"echo": data["n"]}, 200
+
+
+@pytest.fixture
+def sock_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, "nested", "bot.sock")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def test_pipelined_calls_complete_out_of_order(sock_path):
+    async def scenario():
+        server = ipc.IPCServer(FakeWorker(), sock_path, timeout=5)
+        await server.start()
+        client = ipc.IPCClient(sock_path, timeout=5)
+        finished = []
+
+        def call(n, delay):
+            result = client.call("send_message", {"n": n, "delay": delay})
+            finished.append(n)
+            return result
+
+        results = await asyncio.gather(in_thread(call, 1, 0.3), in_thread(call, 2, 0.0))
+        stats = client.stats()
+        await server.close()
+        return results, finished, stats
+
+    results, finished, stats = run(scenario())
+    assert results == [({"echo": 1}, 200), ({"echo": 2}, 200)]
+    assert finished == [2, 1]
+    assert stats["queue_depth"] == 0 and stats["latency"]["count"] == 2
+
+
+def test_slow_handler_times_out(sock_path):
+    async def scenario():
+        server = ipc.IPCServer(FakeWorker(), sock_path, timeout=0.2)
+        await server.start()
+        client = ipc.IPCClient(sock_path, timeout=5)
+        server_side = await in_thread(client.call, "send_message", {"n": 1, "delay": 1})
+
+        slow_client = ipc.IPCClient(sock_path, timeout=0.1)
+        server.timeout = 5
+        with pytest.raises(ipc.IPCTimeout):
+            await in_thread(slow_client.call, "send_message", {"n": 2, "delay": 0.5})
+        await server.close()
+        return server_side, slow_client.timeouts
+
+    server_side, timeouts = run(scenario())
+    assert server_side == ({"error": "Bot timed out processing request"}, 504)
+    assert timeouts == 1
+
+
+def test_client_reconnects_after_server_restart(sock_path):
+    async def scenario():
+        server = ipc.IPCServer(FakeWorker(), sock_path)
+        await server.start()
+        client = ipc.IPCClient(sock_path, connect_retries=1)
+        assert await in_thread(client.call, "send_message", {"n": 1}) == ({"echo": 1}, 200)
+        await server.close()
+
+        with pytest.raises(ipc.IPCError):
+            await in_thread(client.call, "send_message", {"n": 2})
+
+        server = ipc.IPCServer(FakeWorker(), sock_path)
+        await server.start()
+        result = await in_thread(client.call, "send_message", {"n": 3})
+        await server.close()
+        return result, client.reconnects
+
+    assert run(scenario()) == (({"echo": 3}, 200), 1)
+
+
+def test_non_object_lines_are_ignored(sock_path):
+    async def scenario():
+        server = ipc.IPCServer(FakeWorker(), sock_path)
+        await server.start()
+        reader, writer = await asyncio.open_unix_connection(sock_path)
+        writer.write(b'1\n[]\nnot json\n{"id": 7, "method": "send_message", "params": {"n": 7}}\n')
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readline(), 5)
+        writer.close()
+        await server.close()
+        return reply, server.errors
+
+    reply, errors = run(scenario())
+    assert reply.startswith(b'{"id": 7, "result": {"echo": 7}')
+    assert errors == 3
+
+
+def test_start_replaces_stale_socket_but_not_live_one(sock_path):
+    async def scenario():
+        os.makedirs(os.path.dirname(sock_path))
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(sock_path)
+        stale.close()
+
+        server = ipc.IPCServer(FakeWorker(), sock_path)
+        await server.start()
+        with pytest.raises(ipc.IPCError):
+            await ipc.IPCServer(FakeWorker(), sock_path).start()
+        await server.close()
+
+    run(scenario())
+
+
+def test_in_flight_request_finishes_after_client_disconnects(sock_path):
+    class RecordingWorker(FakeWorker):
+        done = []
+
+        async def handle_admin_message(self, data):
+            result = await super().handle_admin_message(data)
+            self.done.append(data["n"])
+            return result
+
+    async def scenario():
+        worker = RecordingWorker()
+        server = ipc.IPCServer(worker, sock_path)
+        await server.start()
+        reader, writer = await asyncio.open_unix_connection(sock_path)
+        writer.write(b'{"id": 1, "method": "send_message", "params": {"n": 1, "delay": 0.2}}\n')
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        writer.close()
+        await asyncio.sleep(0.4)
+        stats = server.stats()
+        await server.close()
+        return worker.done, stats
+
+    done, stats = run(scenario())
+    assert done == [1]
+    assert stats["queue_depth"] == 0 and stats["errors"] == 0
+
+
+def test_socket_creation_failure_raises_ipc_error(sock_path, monkeypatch):
+    def broken_socket(*args):
+        raise OSError("no sockets left")
+
+    monkeypatch.setattr(ipc.socket, "socket", broken_socket)
+    client = ipc.IPCClient(sock_path, connect_retries=1)
+    with pytest.raises(ipc.IPCError):
+        client.call("stats")
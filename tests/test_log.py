@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log
+
+
+def test_records_carry_trace_id_and_traceback():
+    stream = io.StringIO()
+    log.setup_logging("debug", stream)
+    logger = log.get_logger("test")
+
+    async def handler():
+        log.start_trace("abc123")
+        logger.debug("step %s", 1, extra={"channel_id": 5})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("boom")
+
+    try:
+        asyncio.run(handler())
+        logger.info("outside")
+    finally:
+        log.shutdown_logging()
+
+    step, boom, outside = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert step["msg"] == "step 1" and step["trace_id"] == "abc123" and step["channel_id"] == 5
+    assert boom["msg"] == "boom" and "ZeroDivisionError" in boom["exc"]
+    assert "trace_id" not in outside
+
+
+def test_shutdown_detaches_queue_handler():
+    root = log.get_logger("test").parent
+    before = list(root.handlers)
+    for _ in range(2):
+        log.setup_logging("info", io.StringIO())
+        log.shutdown_logging()
+    assert root.handlers == before
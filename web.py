@@ -3,9 +3,12 @@ from flask import Flask, jsonify, request
 import os
 import asyncio
 from flask_cors import CORS
+from dotenv import load_dotenv
 
-# Import the new worker we just made
-import cogs.web_worker 
+import ipc
+import log
+
+logger = log.get_logger("web")
 
 app = Flask(__name__)
 
@@ -13,6 +16,9 @@ app = Flask(__name__)
 bot_loop = None
 worker_module = None
 
+# Set instead of the two above when the web front runs in its own process
+ipc_client = None
+
 # Get allowed origins from env for security
 allowed_origin = os.environ.get("VERCEL_URL", "https://onlygpay.ideahatch.xyz")
 CORS(app, resources={
@@ -26,7 +32,35 @@ def setup(loop, worker):
     global bot_loop, worker_module
     bot_loop = loop
     worker_module = worker
-    print("Web server has received the event loop and web worker.")
+    logger.info("Web server has received the event loop and web worker.")
+
+def setup_ipc(path=None, timeout=None):
+    """Forward work to the bot process over its IPC socket instead of a shared loop."""
+    global ipc_client
+    ipc_client = ipc.IPCClient(path, timeout)
+    logger.info(f"Web server will reach the bot over IPC at {ipc_client.path}.")
+
+def call_bot(method, data):
+    """Sends a request to the bot over IPC and turns transport failures into HTTP errors."""
+    try:
+        return ipc_client.call(method, data)
+    except ipc.IPCTimeout as e:
+        logger.warning(f"IPC timeout: {e}", extra={"method": method})
+        return {"error": "Bot did not respond in time"}, 504
+    except ipc.IPCError as e:
+        logger.error(f"IPC error: {e}", extra={"method": method})
+        return {"error": "Bot is unavailable"}, 503
+
+@app.before_request
+def start_request_trace():
+    # Reuse the caller's id if it sent one so the trace spans the website too
+    log.start_trace(request.headers.get("X-Trace-Id"))
+    logger.info("HTTP request", extra={"method": request.method, "path": request.path})
+
+@app.after_request
+def expose_trace_id(response):
+    response.headers["X-Trace-Id"] = log.get_trace_id()
+    return response
 
 @app.route('/')
 def index():
@@ -36,27 +70,43 @@ def index():
 def health():
     return "OK", 200
 
+@app.route('/stats')
+def stats():
+    """Queue depth and round-trip latency on both ends of the IPC link."""
+    if not ipc_client:
+        return jsonify(mode="thread")
+    bot_stats, status = call_bot("stats", None)
+    return jsonify(mode="ipc", web=ipc_client.stats(), bot=bot_stats if status == 200 else None)
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     # This logic is simple, so it can stay here
     token = request.headers.get("X-Internal-Token")
-    if token != os.getenv("WEBHOOK_SECRET"):
+    secret = os.getenv("WEBHOOK_SECRET")
+    if not secret or token != secret:
         return "Forbidden", 403
     data = request.json
+    if ipc_client:
+        result_dict, status_code = call_bot("webhook", data)
+        return jsonify(result_dict), status_code
     return {"received": True}
 
 # --- THIS ROUTE IS NOW JUST A ROUTER ---
 @app.route('/send-message', methods=['POST'])
 def send_message_route():
     data = request.json
-    
+
+    if ipc_client:
+        result_dict, status_code = call_bot("send_message", data)
+        return jsonify(result_dict), status_code
+
     if not bot_loop or not worker_module:
         return jsonify({"error": "Server is not ready"}), 503
 
     # We are in a sync Flask thread, so we must safely call the
     # async worker function (handle_admin_message) on the bot's event loop.
     future = asyncio.run_coroutine_threadsafe(
-        worker_module.handle_admin_message(data),
+        log.traced(worker_module.handle_admin_message(data), log.get_trace_id()),
         bot_loop
     )
     
@@ -66,10 +116,23 @@ def send_message_route():
         result_dict, status_code = future.result()
         return jsonify(result_dict), status_code
     except Exception as e:
-        print(f"Error in web_worker future: {e}")
+        logger.exception(f"Error in web_worker future: {e}")
         return jsonify({"error": "Failed to process request"}), 500
 
 def start_thread():
     port = int(os.environ.get("WEB_PORT", 8080))
     threading.Thread(target=lambda: app.run(host='127.0.0.1', port=port), daemon=True).start()
-    print("Flask web server thread started.")
\ No newline at end of file
+    logger.info("Flask web server thread started.")
+
+def create_app():
+    """Entry point for running the web front as its own process talking to the bot over IPC.
+
+    Used by `python web.py`, or by a WSGI server pointed at `web:create_app()`.
+    """
+    load_dotenv()
+    log.setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    setup_ipc()
+    return app
+
+if __name__ == "__main__":
+    create_app().run(host='127.0.0.1', port=int(os.environ.get("WEB_PORT", 8080)), threaded=True)